@@ -15,7 +15,7 @@ const mustache = require('mustache')
 const opener = require('opener')
 const _ = require('lodash')
 
-const dataServerMustache = `
+const dataServerHeaderMustache = `
 
 define(function() {
 
@@ -25,12 +25,12 @@ var result = {
       pdbId: "{{pdbId}}",
       pdbText: getPdbLines(),
     }
-    console.log('dataserver.getProteinData', payload)
+    console.log('dataserver.getProteinData', payload.pdbId)
     callback(payload);
   },
   getViews: function(callback) {
     var payload = getViewDicts()
-    console.log('dataserver.getView', payload)
+    console.log('dataserver.getView')
     callback(payload);
   },
   saveViews: function(views, callback) { 
@@ -54,10 +54,9 @@ function getViewDicts() {
 var views = {{{viewsJsonStr}}};
 
 var pdbLines = [
-  {{#pdbLines}} 
-    "{{{.}}}", 
-  {{/pdbLines}}
-];
+`
+
+const dataServerFooter = `];
 
 return result;
     
@@ -65,6 +64,22 @@ return result;
 
 `
 
+/**
+ * Streams the escaped pdbLines into the open file fd in blocks,
+ * so the full data-server text is never built in memory
+ */
+function writePdbLines (fd, pdbLines) {
+  const blockSize = 1000
+  for (let start = 0; start < pdbLines.length; start += blockSize) {
+    let end = Math.min(start + blockSize, pdbLines.length)
+    let block = ''
+    for (let i = start; i < end; i += 1) {
+      block += `    "${pdbLines[i].replace(/"/g, '\\"')}",\n`
+    }
+    fs.writeSync(fd, block)
+  }
+}
+
 const embedIndexHtmlMustache = `
 
 <html>
@@ -196,7 +211,6 @@ if (remain.length < 1) {
     dataServerLoadStr += `"data-server${i}"`
     dataServerArgStr += `dataServer${i}`
     let pdbLines = pdbText.split(/\r?\n/)
-    pdbLines = _.map(pdbLines, l => l.replace(/"/g, '\\"'))
     let pdbId = base
     let viewsJson = pdb.replace('.pdb', '') + '.views.json'
     console.log(`Checking ${viewsJson}`)
@@ -205,13 +219,15 @@ if (remain.length < 1) {
       let text = fs.readFileSync(viewsJson, 'utf8')
       views = JSON.parse(text)
     }
-    let viewsJsonStr = JSON.stringify(views, null, 2)
-    let dataJsText = mustache.render(dataServerMustache, {
-      pdbId,
-      pdbLines,
-      viewsJsonStr
-    })
-    fs.writeFileSync(dataJs, dataJsText)
+    let viewsJsonStr = JSON.stringify(views)
+    let fd = fs.openSync(dataJs, 'w')
+    fs.writeSync(
+      fd,
+      mustache.render(dataServerHeaderMustache, { pdbId, viewsJsonStr })
+    )
+    writePdbLines(fd, pdbLines)
+    fs.writeSync(fd, dataServerFooter)
+    fs.closeSync(fd)
   }
 
   let html = path.join(targetDir, 'index.html')
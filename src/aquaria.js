@@ -642,13 +642,12 @@ class AquariaAlignment {
       let nameLen = _.max(_.map(entries, e => e.name.length))
       let seqLen = _.max(_.map(entries, e => e.seq.length))
       let width = 50
-      let nSection = Math.ceil(seqLen / width)
       let s = ''
-      for (let iSection = 0; iSection < nSection; iSection += 1) {
+      for (let start = 0; start < seqLen; start += width) {
         for (let iEntry = 0; iEntry < entries.length; iEntry += 1) {
           let entry = entries[iEntry]
           s += _.padEnd(entry.name, nameLen) + ' '
-          s += entry.seq.substring(iSection * width, (iSection + 1) * width)
+          s += entry.seq.substring(start, start + width)
           s += '\n'
         }
         s += '\n'
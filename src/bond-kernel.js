@@ -0,0 +1,212 @@
+/**
+ * @file bond-kernel - finds close pairs of atoms for bonding directly
+ * on the typed arrays of the atomStore.
+ *
+ * Atoms are counting-sorted into the occupied cells of a uniform
+ * grid of cubic cells, stored as flat arrays: cellStart[iCell] to
+ * cellStart[iCell + 1] indexes the atoms of a cell in cellAtoms, and
+ * cellOfKey maps the integer key of a grid position to its cell.
+ * As the side of a cell is at least maxCutoff, only the 27 cells
+ * around an atom need to be searched.
+ *
+ * The kernel uses only numbers and typed arrays so that it stays
+ * monomorphic and is compiled to tight machine code by the JIT.
+ */
+
+/**
+ * Grow the Int32Array of pairs if it holds fewer than nPair pairs
+ * @param {Int32Array} pairs
+ * @param {Integer} nPair
+ * @returns {Int32Array}
+ */
+function ensurePairCapacity (pairs, nPair) {
+  if (2 * nPair <= pairs.length) {
+    return pairs
+  }
+  let newPairs = new Int32Array(Math.max(2 * pairs.length, 2 * nPair))
+  newPairs.set(pairs)
+  return newPairs
+}
+
+/**
+ * Finds bonded pairs of atoms within the same residue. Atoms with
+ * different non-zero alt codes are never bonded.
+ *
+ * @param {Float32Array} x
+ * @param {Float32Array} y
+ * @param {Float32Array} z
+ * @param {Uint32Array} iRes - residue index of each atom
+ * @param {Uint8Array} alt - char code of alt position, 0 if none
+ * @param {Uint8Array} cutoffClass - cutoff class of each atom
+ * @param {Integer} nAtom
+ * @param {Float64Array} cutoffSqTable - squared cutoff of a pair of
+ *   atoms, indexed by cutoffClass[i] * nCutoffClass + cutoffClass[j]
+ * @param {Integer} nCutoffClass
+ * @returns {Int32Array} - flat [iAtom1, iAtom2, ...] with iAtom1 < iAtom2
+ */
+function findBondPairs (
+  x,
+  y,
+  z,
+  iRes,
+  alt,
+  cutoffClass,
+  nAtom,
+  cutoffSqTable,
+  nCutoffClass
+) {
+  if (nAtom === 0) {
+    return new Int32Array(0)
+  }
+  let maxCutoffSq = 0
+  for (let iEntry = 0; iEntry < cutoffSqTable.length; iEntry += 1) {
+    maxCutoffSq = Math.max(maxCutoffSq, cutoffSqTable[iEntry])
+  }
+  let maxCutoff = Math.sqrt(maxCutoffSq)
+
+  // atoms with missing coordinates (NaN from truncated lines)
+  // are left out of the grid and are never bonded
+  let isInGrid = new Uint8Array(nAtom)
+  let nInGrid = 0
+  let minX = Infinity
+  let minY = Infinity
+  let minZ = Infinity
+  let maxX = -Infinity
+  let maxY = -Infinity
+  let maxZ = -Infinity
+  for (let i = 0; i < nAtom; i += 1) {
+    if (!(isFinite(x[i]) && isFinite(y[i]) && isFinite(z[i]))) {
+      continue
+    }
+    isInGrid[i] = 1
+    nInGrid += 1
+    if (x[i] < minX) minX = x[i]
+    if (y[i] < minY) minY = y[i]
+    if (z[i] < minZ) minZ = z[i]
+    if (x[i] > maxX) maxX = x[i]
+    if (y[i] > maxY) maxY = y[i]
+    if (z[i] > maxZ) maxZ = z[i]
+  }
+  if (nInGrid === 0) {
+    return new Int32Array(0)
+  }
+
+  // the side of a cell is fixed at maxCutoff, and only occupied
+  // cells are stored, so distant atoms (such as 9999.0 placeholders
+  // for missing coordinates) cost one extra cell each. Cells are
+  // only widened if needed to keep the integer cell keys exact
+  const maxSpaceIndex = 131072
+  let maxSpan = Math.max(maxX - minX, maxY - minY, maxZ - minZ)
+  let cellSize = Math.max(maxCutoff, maxSpan / (maxSpaceIndex - 1))
+  let invCellSize = 1.0 / cellSize
+  let nY = Math.floor((maxY - minY) * invCellSize) + 1
+  let nZ = Math.floor((maxZ - minZ) * invCellSize) + 1
+
+  // spaces of each atom in the grid, and the occupied cells
+  let spaces = new Int32Array(3 * nAtom)
+  let cellOfAtom = new Int32Array(nAtom)
+  let cellOfKey = new Map()
+  let nCell = 0
+  for (let i = 0; i < nAtom; i += 1) {
+    if (!isInGrid[i]) {
+      cellOfAtom[i] = -1
+      continue
+    }
+    let iX = Math.floor((x[i] - minX) * invCellSize)
+    let iY = Math.floor((y[i] - minY) * invCellSize)
+    let iZ = Math.floor((z[i] - minZ) * invCellSize)
+    spaces[3 * i] = iX
+    spaces[3 * i + 1] = iY
+    spaces[3 * i + 2] = iZ
+    let key = (iX * nY + iY) * nZ + iZ
+    let iCell = cellOfKey.get(key)
+    if (iCell === undefined) {
+      iCell = nCell
+      cellOfKey.set(key, iCell)
+      nCell += 1
+    }
+    cellOfAtom[i] = iCell
+  }
+
+  let cellStart = new Int32Array(nCell + 1)
+  for (let i = 0; i < nAtom; i += 1) {
+    if (cellOfAtom[i] >= 0) {
+      cellStart[cellOfAtom[i] + 1] += 1
+    }
+  }
+  for (let iCell = 0; iCell < nCell; iCell += 1) {
+    cellStart[iCell + 1] += cellStart[iCell]
+  }
+  let cellFill = cellStart.slice(0, nCell)
+  let cellAtoms = new Int32Array(nInGrid)
+  for (let i = 0; i < nAtom; i += 1) {
+    let iCell = cellOfAtom[i]
+    if (iCell < 0) {
+      continue
+    }
+    cellAtoms[cellFill[iCell]] = i
+    cellFill[iCell] += 1
+  }
+
+  let pairs = new Int32Array(4 * nAtom)
+  let nPair = 0
+
+  // neighbouring cells are looked up once per occupied cell
+  let neighbourCells = new Int32Array(27)
+  for (let iCell = 0; iCell < nCell; iCell += 1) {
+    let iFirst = cellAtoms[cellStart[iCell]]
+    let iX = spaces[3 * iFirst]
+    let iY = spaces[3 * iFirst + 1]
+    let iZ = spaces[3 * iFirst + 2]
+
+    let yStart = Math.max(0, iY - 1)
+    let yEnd = Math.min(nY, iY + 2)
+    let zStart = Math.max(0, iZ - 1)
+    let zEnd = Math.min(nZ, iZ + 2)
+
+    let nNeighbour = 0
+    for (let jX = Math.max(0, iX - 1); jX < iX + 2; jX += 1) {
+      for (let jY = yStart; jY < yEnd; jY += 1) {
+        for (let jZ = zStart; jZ < zEnd; jZ += 1) {
+          let jCell = cellOfKey.get((jX * nY + jY) * nZ + jZ)
+          if (jCell !== undefined) {
+            neighbourCells[nNeighbour] = jCell
+            nNeighbour += 1
+          }
+        }
+      }
+    }
+
+    for (let k = cellStart[iCell]; k < cellStart[iCell + 1]; k += 1) {
+      let i = cellAtoms[k]
+      for (let iNeighbour = 0; iNeighbour < nNeighbour; iNeighbour += 1) {
+        let jCell = neighbourCells[iNeighbour]
+        for (let l = cellStart[jCell]; l < cellStart[jCell + 1]; l += 1) {
+          let j = cellAtoms[l]
+          if (j <= i || iRes[i] !== iRes[j]) {
+            continue
+          }
+          // don't include bonds between different alt positions
+          if (alt[i] !== 0 && alt[j] !== 0 && alt[i] !== alt[j]) {
+            continue
+          }
+          let diffX = x[i] - x[j]
+          let diffY = y[i] - y[j]
+          let diffZ = z[i] - z[j]
+          let distSq = diffX * diffX + diffY * diffY + diffZ * diffZ
+          let iEntry = cutoffClass[i] * nCutoffClass + cutoffClass[j]
+          if (distSq <= cutoffSqTable[iEntry]) {
+            pairs = ensurePairCapacity(pairs, nPair + 1)
+            pairs[2 * nPair] = i
+            pairs[2 * nPair + 1] = j
+            nPair += 1
+          }
+        }
+      }
+    }
+  }
+
+  return pairs.subarray(0, 2 * nPair)
+}
+
+export { findBondPairs }
@@ -86,6 +86,18 @@ class EmbedJolecule {
 
     let asyncSetMesssage = m => this.soupWidget.asyncSetMesssage(m)
 
+    // views only depend on the dataServer, so fetch them
+    // while the structure is downloaded and parsed
+    let isFirstDataServer = _.isNil(this.soupView.dataServer)
+    let viewsPromise = null
+    if (isFirstDataServer) {
+      viewsPromise = new Promise(resolve => {
+        dataServer.getViews((viewDicts, viewId) => {
+          resolve({ viewDicts, viewId })
+        })
+      })
+    }
+
     await new Promise(resolve => {
       dataServer.getProteinData(async proteinData => {
         await this.controller.asyncLoadProteinData(
@@ -102,26 +114,22 @@ class EmbedJolecule {
 
     this.controller.zoomOut()
 
-    if (_.isNil(this.soupView.dataServer)) {
+    if (isFirstDataServer) {
       await this.soupWidget.asyncSetMesssage('Preparing views...')
 
       // save only first loaded dataServer for saving and deleting
       this.soupWidget.dataServer = dataServer
 
-      await new Promise(resolve => {
-        dataServer.getViews((viewDicts, viewId) => {
-          this.controller.loadViewsFromViewDicts(viewDicts)
-          if (viewId) {
-            this.params.viewId = viewId
-          }
-          let isDefaultViewId =
-            this.params.viewId in this.soupView.savedViewsByViewId
-          if (isDefaultViewId) {
-            this.controller.setTargetViewByViewId(this.params.viewId)
-          }
-          resolve()
-        })
-      })
+      let { viewDicts, viewId } = await viewsPromise
+      this.controller.loadViewsFromViewDicts(viewDicts)
+      if (viewId) {
+        this.params.viewId = viewId
+      }
+      let isDefaultViewId =
+        this.params.viewId in this.soupView.savedViewsByViewId
+      if (isDefaultViewId) {
+        this.controller.setTargetViewByViewId(this.params.viewId)
+      }
 
       this.soupView.isUpdateObservers = true
     }
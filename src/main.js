@@ -66,6 +66,30 @@ function makePdbDataServer (args) {
   )
 }
 
+// PDB texts downloaded by makeDataServer keyed by url, so that
+// reloading a structure doesn't download it again. The cache is
+// bounded by the total length of the texts, and large texts, which
+// are better left to the browser cache, are never kept
+const maxCachedPdbTextLength = 2000000
+const maxTotalPdbTextLength = 8000000
+let pdbTextByUrl = {}
+let pdbTextUrls = []
+let totalPdbTextLength = 0
+
+function cachePdbText (url, pdbText) {
+  if (url in pdbTextByUrl || pdbText.length > maxCachedPdbTextLength) {
+    return
+  }
+  pdbTextUrls.push(url)
+  pdbTextByUrl[url] = pdbText
+  totalPdbTextLength += pdbText.length
+  while (totalPdbTextLength > maxTotalPdbTextLength) {
+    let oldUrl = pdbTextUrls.shift()
+    totalPdbTextLength -= pdbTextByUrl[oldUrl].length
+    delete pdbTextByUrl[oldUrl]
+  }
+}
+
 /**
  * @param pdbId: Str - id of RCSB protein structure
  * @param userId: Str - optional id of user on http://jolecule.com;
@@ -110,12 +134,20 @@ function makeDataServer (
       } else {
         url = `${saveViewsUrl}/pdb/${pdbId}.txt`
       }
+      if (url in pdbTextByUrl) {
+        console.log(
+          `makeDataServer.getProteinData cached ${url} biounit:${biounit}`
+        )
+        asyncCallback({ pdbId: pdbId, pdbText: pdbTextByUrl[url] })
+        return
+      }
       $.get(url)
         .done(pdbText => {
           let result = { pdbId: pdbId, pdbText: pdbText }
           console.log(
             `makeDataServer.getProteinData success ${url} biounit:${biounit}`
           )
+          cachePdbText(url, pdbText)
           asyncCallback(result)
         })
         .fail(() => {
@@ -142,7 +174,7 @@ function makeDataServer (
       }
       $.getJSON(url)
         .done(views => {
-          console.log('makeDataServer.getViews', url, views)
+          console.log('makeDataServer.getViews', url, _.size(views))
           callback(views, viewId)
         })
         .fail(() => {
@@ -162,11 +194,19 @@ function makeDataServer (
       }
       $.post(`${saveViewsUrl}/save/views`, JSON.stringify(views))
         .done(() => {
-          console.log('makeDataServer.saveViews success', '/save/views', views)
+          console.log(
+            'makeDataServer.saveViews success',
+            '/save/views',
+            _.size(views)
+          )
           callback(true)
         })
         .fail(() => {
-          console.log('makeDataServer.saveViews fail', '/save/views', views)
+          console.log(
+            'makeDataServer.saveViews fail',
+            '/save/views',
+            _.size(views)
+          )
           callback(false)
         })
     },
@@ -3,7 +3,8 @@
  * using spatial hashes of boxes of div^3. All vertices in neighboring
  * boxes are considered close pairs.
  *
- * Vertex - [x, y, z] in real coordinates
+ * Vertex - [x, y, z] in real coordinates, stored as a structure
+ *          of arrays xs[iVertex], ys[iVertex], zs[iVertex]
  *
  * Space - [i, j, k] integer indices in grid space
  *
@@ -11,14 +12,21 @@
  *
  * SpaceHashes are spaces converted to a single integer
  *
- * @param {Array<THREE.Vector3>} vertices - list of positions
+ * As only neighbouring boxes are searched, div must be at least
+ * as large as the largest distance of interest between vertices.
+ *
+ * @param {Float32Array} xs - x-coordinates of the vertices
+ * @param {Float32Array} ys - y-coordinates of the vertices
+ * @param {Float32Array} zs - z-coordinates of the vertices
+ * @param {Number} div - length of the side of a box
  * @returns {Array} - array of pairs of positions
  */
 class SpaceHash {
-  constructor (vertices) {
-    this.vertices = vertices
+  constructor (xs, ys, zs, div = 5.0) {
+    this.coords = [xs, ys, zs]
+    this.nVertex = xs.length
     this.padding = 0.05
-    this.div = 5.0
+    this.div = div
     this.invDiv = 1.0 / this.div
     this.maxima = [0.0, 0.0, 0.0]
     this.minima = [0.0, 0.0, 0.0]
@@ -26,27 +34,29 @@ class SpaceHash {
     this.sizes = [0, 0, 0]
 
     for (let iDim = 0; iDim < 3; iDim++) {
-      for (let iVertex = 0; iVertex < this.vertices.length; iVertex += 1) {
-        if (this.minima[iDim] > this.vertices[iVertex][iDim]) {
-          this.minima[iDim] = this.vertices[iVertex][iDim]
+      let values = this.coords[iDim]
+      for (let iVertex = 0; iVertex < this.nVertex; iVertex += 1) {
+        if (this.minima[iDim] > values[iVertex]) {
+          this.minima[iDim] = values[iVertex]
         }
-        if (this.maxima[iDim] < this.vertices[iVertex][iDim]) {
-          this.maxima[iDim] = this.vertices[iVertex][iDim]
+        if (this.maxima[iDim] < values[iVertex]) {
+          this.maxima[iDim] = values[iVertex]
         }
       }
       this.minima[iDim] -= this.padding
       this.maxima[iDim] += this.padding
       this.spans[iDim] = this.maxima[iDim] - this.minima[iDim]
-      this.sizes[iDim] = Math.ceil(this.spans[iDim] * this.invDiv)
+      this.sizes[iDim] = Math.floor(this.spans[iDim] * this.invDiv) + 1
     }
 
     this.cells = {}
-    this.spaces = []
-    for (let iVertex = 0; iVertex < this.vertices.length; iVertex++) {
-      let vertex = this.vertices[iVertex]
-      let space = this.getSpaceFromVertex(vertex)
-      this.spaces.push(space)
-      let hash = this.getHashFromSpace(space)
+    this.spaces = new Int32Array(3 * this.nVertex)
+    for (let iVertex = 0; iVertex < this.nVertex; iVertex++) {
+      for (let iDim = 0; iDim < 3; iDim++) {
+        let value = this.coords[iDim][iVertex]
+        this.spaces[3 * iVertex + iDim] = this.getSpaceIndex(value, iDim)
+      }
+      let hash = this.getHashFromSpace(this.getSpaceOfVertex(iVertex))
       if (!(hash in this.cells)) {
         this.cells[hash] = []
       }
@@ -54,20 +64,41 @@ class SpaceHash {
     }
   }
 
+  getSpaceIndex (value, iDim) {
+    return Math.floor((value - this.minima[iDim]) * this.invDiv)
+  }
+
   getSpaceFromVertex (vertex) {
     let result = []
     for (let iDim = 0; iDim < 3; iDim++) {
-      result.push(Math.round((vertex[iDim] - this.minima[iDim]) * this.invDiv))
+      result.push(this.getSpaceIndex(vertex[iDim], iDim))
     }
     return result
   }
 
+  getSpaceOfVertex (iVertex) {
+    return this.spaces.subarray(3 * iVertex, 3 * iVertex + 3)
+  }
+
   getHashFromSpace (s) {
     return s[0] * this.sizes[1] * this.sizes[2] + s[1] * this.sizes[2] + s[2]
   }
 
-  pushCellOfSpace (pairs, vertex, iVertex) {
-    let spaceCenter = this.getSpaceFromVertex(vertex)
+  /**
+   * Pushes [iVertex, jVertex] for all vertices jVertex in the boxes
+   * around spaceCenter, skipping those with jVertex < jVertexStart.
+   * If cutoffSq is given, only vertices jVertex within sqrt(cutoffSq)
+   * of the vertex iVertex are pushed
+   */
+  pushCellOfSpace (
+    pairs,
+    spaceCenter,
+    iVertex,
+    jVertexStart = 0,
+    cutoffSq = null
+  ) {
+    let [xs, ys, zs] = this.coords
+    let isCheckDistance = cutoffSq !== null
 
     let space0start = Math.max(0, spaceCenter[0] - 1)
     let space0end = Math.min(this.sizes[0], spaceCenter[0] + 2)
@@ -88,6 +119,18 @@ class SpaceHash {
               jVertexInCell++
             ) {
               let jVertex = cell[jVertexInCell]
+              if (jVertex < jVertexStart) {
+                continue
+              }
+              if (isCheckDistance) {
+                let diffX = xs[iVertex] - xs[jVertex]
+                let diffY = ys[iVertex] - ys[jVertex]
+                let diffZ = zs[iVertex] - zs[jVertex]
+                let distSq = diffX * diffX + diffY * diffY + diffZ * diffZ
+                if (distSq > cutoffSq) {
+                  continue
+                }
+              }
               pairs.push([iVertex, jVertex])
             }
           }
@@ -96,17 +139,40 @@ class SpaceHash {
     }
   }
 
+  /**
+   * Returns each close pair once as [iVertex, jVertex] with
+   * iVertex < jVertex, as pairs are symmetric
+   * @returns {Array} - array of pairs of indices
+   */
   getClosePairs () {
     let pairs = []
-    for (let iVertex = 0; iVertex < this.vertices.length; iVertex++) {
-      this.pushCellOfSpace(pairs, this.vertices[iVertex], iVertex)
+    for (let iVertex = 0; iVertex < this.nVertex; iVertex++) {
+      let space = this.getSpaceOfVertex(iVertex)
+      this.pushCellOfSpace(pairs, space, iVertex, iVertex + 1)
+    }
+    return pairs
+  }
+
+  /**
+   * Returns only the pairs of vertices that are within cutoff,
+   * each pair given once as [iVertex, jVertex] with iVertex < jVertex.
+   * Requires cutoff <= this.div
+   * @param {Number} cutoff
+   * @returns {Array} - array of pairs of indices
+   */
+  getPairsWithinDistance (cutoff) {
+    let cutoffSq = cutoff * cutoff
+    let pairs = []
+    for (let iVertex = 0; iVertex < this.nVertex; iVertex++) {
+      let space = this.getSpaceOfVertex(iVertex)
+      this.pushCellOfSpace(pairs, space, iVertex, iVertex + 1, cutoffSq)
     }
     return pairs
   }
 
   getVerticesNearPoint (vertex, iVertex) {
     let pairs = []
-    this.pushCellOfSpace(pairs, vertex, iVertex)
+    this.pushCellOfSpace(pairs, this.getSpaceFromVertex(vertex), iVertex)
     return pairs
   }
 }
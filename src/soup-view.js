@@ -4,6 +4,32 @@ import { randomId, exists } from './util.js'
 import * as glgeom from './glgeom'
 import * as THREE from 'three'
 
+/**
+ * Pairs of [View attribute, view dictionary key] that are
+ * copied directly in View.setFromDict
+ */
+const viewAttrDictKeys = [
+  ['id', 'view_id'],
+  ['pdbId', 'pdb_id'],
+  ['lock', 'lock'],
+  ['creator', 'creator'],
+  ['text', 'text'],
+  ['userId', 'user_id'],
+  ['order', 'order'],
+  ['resId', 'resId'],
+  ['iAtom', 'i_atom'],
+  ['labels', 'labels'],
+  ['selected', 'selected'],
+  ['distances', 'distances']
+]
+
+/**
+ * Keys of view.show that are named differently in the view dictionary
+ */
+const showKeyOfDictKey = {
+  all_atom: 'backbone'
+}
+
 /**
  * View
  * ----
@@ -153,26 +179,14 @@ class View {
   }
 
   setFromDict (flatDict) {
-    this.id = flatDict.view_id
-    this.pdbId = flatDict.pdb_id
-    this.lock = flatDict.lock
-    this.creator = flatDict.creator
-    this.text = flatDict.text
-    this.userId = flatDict.user_id
-    this.order = flatDict.order
-    this.resId = flatDict.resId
-    this.iAtom = flatDict.i_atom
-
-    this.labels = flatDict.labels
-    this.selected = flatDict.selected
-    this.distances = flatDict.distances
-
-    for (let key of _.keys(flatDict.show)) {
-      if (key in this.show) {
-        this.show[key] = !!flatDict.show[key]
-      }
-      if (key === 'all_atom') {
-        this.show.backbone = !!flatDict.show.all_atom
+    for (let [attr, dictKey] of viewAttrDictKeys) {
+      this[attr] = flatDict[dictKey]
+    }
+
+    for (let [key, value] of _.toPairs(flatDict.show)) {
+      let showKey = key in showKeyOfDictKey ? showKeyOfDictKey[key] : key
+      if (showKey in this.show) {
+        this.show[showKey] = !!value
       }
     }
 
@@ -1166,7 +1180,7 @@ class SoupViewController {
     for (let iRes = 0; iRes < this.soup.getResidueCount(); iRes += 1) {
       residue.load(iRes)
       if (residue.selected) {
-        indices = _.concat(indices, this.soup.getNeighbours(iRes))
+        indices.push(...this.soup.getNeighbours(iRes))
         nSelected += 1
       }
     }
@@ -1180,7 +1194,7 @@ class SoupViewController {
     if (indices.length === 0) {
       let iAtom = this.soupView.currentView.iAtom
       let iRes = this.soup.getAtomProxy(iAtom).iRes
-      indices = _.concat(indices, this.soup.getNeighbours(iRes))
+      indices.push(...this.soup.getNeighbours(iRes))
     }
     let nSidechain = 0
     for (let iRes of indices) {
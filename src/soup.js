@@ -3,6 +3,7 @@ import v3 from './v3'
 import { inArray } from './util.js'
 import * as glgeom from './glgeom'
 import { SpaceHash } from './pairs.js'
+import { findBondPairs } from './bond-kernel.js'
 import Store from './store.js'
 import * as data from './data'
 import * as THREE from 'three'
@@ -51,9 +52,8 @@ function charToInt (c) {
   return c.charCodeAt(0)
 }
 
-function parsetTitleFromPdbText (text) {
+function parseTitleFromPdbLines (lines) {
   let result = ''
-  let lines = text.split(/\r?\n/)
   for (let line of lines) {
     if (line.substring(0, 5) === 'TITLE') {
       result += line.substring(10)
@@ -62,6 +62,26 @@ function parsetTitleFromPdbText (text) {
   return result
 }
 
+/**
+ * Copies the coordinates of the atoms into a structure of arrays
+ * @param {Store} atomStore
+ * @param {Array<Integer>} atomIndices
+ * @returns {Array<Float32Array>} - [xs, ys, zs]
+ */
+function getCoordsOfAtoms (atomStore, atomIndices) {
+  let n = atomIndices.length
+  let xs = new Float32Array(n)
+  let ys = new Float32Array(n)
+  let zs = new Float32Array(n)
+  for (let i = 0; i < n; i += 1) {
+    let iAtom = atomIndices[i]
+    xs[i] = atomStore.x[iAtom]
+    ys[i] = atomStore.y[iAtom]
+    zs[i] = atomStore.z[iAtom]
+  }
+  return [xs, ys, zs]
+}
+
 function getIndexColor (i) {
   return new THREE.Color().setHex(i + 1)
 }
@@ -619,11 +639,6 @@ class Soup {
     this.structureIds.push(pdbId)
     this.iStructure = this.structureIds.length - 1
 
-    let title = parsetTitleFromPdbText(pdbText)
-    let id = this.structureId.toUpperCase()
-    this.title =
-      `[<a href="http://www.rcsb.org/structure/${id}">${id}</a>] ` + title
-
     let pdbLines = pdbText.split(/\r?\n/)
 
     if (pdbLines.length === 0) {
@@ -631,13 +646,19 @@ class Soup {
       return
     }
 
-    for (let i of _.range(pdbLines.length)) {
-      if (_.includes(['END'], pdbLines[i].slice(0, 3))) {
-        pdbLines = pdbLines.slice(0, i)
+    // keep only the first model, stopping at END or ENDMDL
+    for (let i = 0; i < pdbLines.length; i += 1) {
+      if (pdbLines[i].startsWith('END')) {
+        pdbLines.length = i
         break
       }
     }
 
+    let title = parseTitleFromPdbLines(pdbLines)
+    let id = this.structureId.toUpperCase()
+    this.title =
+      `[<a href="http://www.rcsb.org/structure/${id}">${id}</a>] ` + title
+
     this.parseAtomLines(pdbLines)
     this.parseSecondaryStructureLines(pdbLines)
   }
@@ -906,34 +927,37 @@ class Soup {
     return result
   }
 
+  /**
+   * Returns the largest side of the bounding box (that includes the
+   * origin) of the atoms, found in a single pass over the atomStore
+   * @param {Array<Integer>|null} atomIndices - all atoms if null
+   * @returns {Number}
+   */
   calcMaxLength (atomIndices = null) {
     let maxima = [0.0, 0.0, 0.0]
     let minima = [0.0, 0.0, 0.0]
-    let spans = [0.0, 0.0, 0.0]
-
-    function comp (v, i) {
-      if (i === 0) return v.x
-      if (i === 1) return v.y
-      if (i === 2) return v.z
-    }
-
-    if (_.isNull(atomIndices)) {
-      atomIndices = _.range(this.getAtomCount())
-    }
-    let atom = this.getAtomProxy()
-    for (let iDim = 0; iDim < 3; iDim++) {
-      for (let iAtom of atomIndices) {
-        let pos = atom.load(iAtom).pos
-        if (minima[iDim] > comp(pos, iDim)) {
-          minima[iDim] = comp(pos, iDim)
+    let coords = [this.atomStore.x, this.atomStore.y, this.atomStore.z]
+
+    let isAllAtoms = _.isNull(atomIndices)
+    let n = isAllAtoms ? this.getAtomCount() : atomIndices.length
+    for (let i = 0; i < n; i += 1) {
+      let iAtom = isAllAtoms ? i : atomIndices[i]
+      for (let iDim = 0; iDim < 3; iDim++) {
+        let value = coords[iDim][iAtom]
+        if (minima[iDim] > value) {
+          minima[iDim] = value
         }
-        if (maxima[iDim] < comp(pos, iDim)) {
-          maxima[iDim] = comp(pos, iDim)
+        if (maxima[iDim] < value) {
+          maxima[iDim] = value
         }
       }
-      spans[iDim] = maxima[iDim] - minima[iDim]
     }
-    return Math.max(spans[0], spans[1], spans[2])
+
+    return Math.max(
+      maxima[0] - minima[0],
+      maxima[1] - minima[1],
+      maxima[2] - minima[2]
+    )
   }
 
   /**
@@ -941,8 +965,8 @@ class Soup {
    * neighbouring residues. Two bonds are defined for
    * each contact, allowing the bonds to be cheaply
    * assigned to either atom without requiring
-   * double-looping. This is quite an expensive step
-   * using this naive algoirthm
+   * double-looping. Bonds within residues are found
+   * by the grid search of findBondPairs
    */
   calcBondsStrategic () {
     this.bondStore.count = 0
@@ -952,43 +976,50 @@ class Soup {
     const largeCutoffSq = 2.4 * 2.4
     const CHONPS = ['C', 'H', 'O', 'N', 'P', 'S']
 
-    function isBonded (atom1, atom2) {
-      if (atom1 === null || atom2 === null) {
-        return false
+    // classify each element once, then each atom by its element:
+    // 0 - hydrogen, 1 - other CHONPS, 2 - everything else
+    let cutoffClassOfElem = _.map(this.elemTable, elem => {
+      if (elem === 'H') {
+        return 0
+      } else if (inArray(elem, CHONPS)) {
+        return 1
+      } else {
+        return 2
       }
-      // don't include bonds between different alt positions
-      if (atom1.alt !== '' && atom2.alt !== '') {
-        if (atom1.alt !== atom2.alt) {
-          return false
+    })
+    let nAtom = this.getAtomCount()
+    let iElem = this.atomStore.iElem
+    let cutoffClass = new Uint8Array(nAtom)
+    for (let iAtom = 0; iAtom < nAtom; iAtom += 1) {
+      cutoffClass[iAtom] = cutoffClassOfElem[iElem[iAtom]]
+    }
+
+    // squared cutoff for each pair of classes, so that the
+    // bond search needs a single lookup instead of branching
+    const nCutoffClass = 3
+    let cutoffSqTable = new Float64Array(nCutoffClass * nCutoffClass)
+    for (let class1 = 0; class1 < nCutoffClass; class1 += 1) {
+      for (let class2 = 0; class2 < nCutoffClass; class2 += 1) {
+        let cutoffSq = largeCutoffSq
+        if (class1 === 0 || class2 === 0) {
+          cutoffSq = smallCutoffSq
+        } else if (class1 === 1 && class2 === 1) {
+          cutoffSq = mediumCutoffSq
         }
+        cutoffSqTable[class1 * nCutoffClass + class2] = cutoffSq
       }
-
-      let cutoffSq
-      if (atom1.elem === 'H' || atom2.elem === 'H') {
-        cutoffSq = smallCutoffSq
-      } else if (inArray(atom1.elem, CHONPS) && inArray(atom2.elem, CHONPS)) {
-        cutoffSq = mediumCutoffSq
-      } else {
-        cutoffSq = largeCutoffSq
-      }
-
-      let diffX = atom1.pos.x - atom2.pos.x
-      let diffY = atom1.pos.y - atom2.pos.y
-      let diffZ = atom1.pos.z - atom2.pos.z
-      let distSq = diffX * diffX + diffY * diffY + diffZ * diffZ
-      return distSq <= cutoffSq
     }
 
-    let makeBond = (atom1, atom2) => {
+    let makeBond = (iAtom1, iAtom2) => {
       let iBond = this.getBondCount()
       this.bondStore.increment()
-      this.bondStore.iAtom1[iBond] = atom1.iAtom
-      this.bondStore.iAtom2[iBond] = atom2.iAtom
+      this.bondStore.iAtom1[iBond] = iAtom1
+      this.bondStore.iAtom2[iBond] = iAtom2
 
       iBond = this.getBondCount()
       this.bondStore.increment()
-      this.bondStore.iAtom1[iBond] = atom2.iAtom
-      this.bondStore.iAtom2[iBond] = atom1.iAtom
+      this.bondStore.iAtom1[iBond] = iAtom2
+      this.bondStore.iAtom2[iBond] = iAtom1
     }
 
     let residue1 = this.getResidueProxy()
@@ -997,19 +1028,20 @@ class Soup {
     let atom1 = this.getAtomProxy()
     let atom2 = this.getAtomProxy()
 
-    for (let iRes1 = 0; iRes1 < nRes; iRes1++) {
-      residue2.iRes = iRes1
-
-      // cycle through all atoms within a residue
-      for (let iAtom1 of residue2.getAtomIndices()) {
-        for (let iAtom2 of residue2.getAtomIndices()) {
-          atom1.iAtom = iAtom1
-          atom2.iAtom = iAtom2
-          if (isBonded(atom1, atom2)) {
-            makeBond(atom1, atom2)
-          }
-        }
-      }
+    // bonds within residues
+    let pairs = findBondPairs(
+      this.atomStore.x,
+      this.atomStore.y,
+      this.atomStore.z,
+      this.atomStore.iRes,
+      this.atomStore.alt,
+      cutoffClass,
+      nAtom,
+      cutoffSqTable,
+      nCutoffClass
+    )
+    for (let iPair = 0; iPair < pairs.length; iPair += 2) {
+      makeBond(pairs[iPair], pairs[iPair + 1])
     }
 
     for (let iRes2 = 1; iRes2 < nRes; iRes2++) {
@@ -1031,7 +1063,7 @@ class Soup {
       } else {
         continue
       }
-      makeBond(atom1, atom2)
+      makeBond(atom1.iAtom, atom2.iAtom)
     }
 
     // sort bonds by iAtom1
@@ -1074,7 +1106,6 @@ class Soup {
       iStructure += 1
     ) {
       // Collect backbone O and N atoms
-      let vertices = []
       let atomIndices = []
       for (let iRes = 0; iRes < this.getResidueCount(); iRes += 1) {
         residue.iRes = iRes
@@ -1086,16 +1117,15 @@ class Soup {
           for (let aTypeName of ['O', 'N']) {
             let iAtom = residue.getIAtom(aTypeName)
             if (iAtom !== null) {
-              atom0.iAtom = iAtom
-              vertices.push([atom0.pos.x, atom0.pos.y, atom0.pos.z])
               atomIndices.push(iAtom)
             }
           }
         }
       }
 
-      let spaceHash = new SpaceHash(vertices)
-      for (let pair of spaceHash.getClosePairs()) {
+      let coords = getCoordsOfAtoms(this.atomStore, atomIndices)
+      let spaceHash = new SpaceHash(...coords, cutoff)
+      for (let pair of spaceHash.getPairsWithinDistance(cutoff)) {
         atom0.iAtom = atomIndices[pair[0]]
         atom1.iAtom = atomIndices[pair[1]]
         if (atom0.elem === 'O' && atom1.elem === 'N') {
@@ -1109,9 +1139,7 @@ class Soup {
         if (iRes0 === iRes1) {
           continue
         }
-        if (v3.distance(atom0.pos, atom1.pos) <= cutoff) {
-          pushToListInDict(result, iRes0, iRes1)
-        }
+        pushToListInDict(result, iRes0, iRes1)
       }
     }
 
@@ -1156,7 +1184,6 @@ class Soup {
     }
 
     // Collect ca atoms
-    let vertices = []
     let atomIndices = []
     let resIndices = []
     for (let iRes = 0; iRes < this.getResidueCount(); iRes += 1) {
@@ -1164,8 +1191,6 @@ class Soup {
       if (residue0.isPolymer && !(residue0.ss === 'D')) {
         let iAtom = residue0.getIAtom('CA')
         if (iAtom !== null) {
-          atom0.iAtom = iAtom
-          vertices.push([atom0.pos.x, atom0.pos.y, atom0.pos.z])
           atomIndices.push(iAtom)
           resIndices.push(iRes)
         }
@@ -1208,7 +1233,8 @@ class Soup {
     }
 
     let betaResidues = []
-    let spaceHash = new SpaceHash(vertices)
+    let coords = getCoordsOfAtoms(this.atomStore, atomIndices)
+    let spaceHash = new SpaceHash(...coords)
     for (let pair of spaceHash.getClosePairs()) {
       let [iVertex0, iVertex1] = pair
       let iRes0 = resIndices[iVertex0]
@@ -1218,15 +1244,15 @@ class Soup {
       }
       // parallel beta sheet pairs
       if (isCONH(iRes0, iRes1 + 1) && isCONH(iRes1 - 1, iRes0)) {
-        betaResidues = betaResidues.concat([iRes0, iRes1])
+        betaResidues.push(iRes0, iRes1)
       }
       if (isCONH(iRes0 - 1, iRes1) && isCONH(iRes1, iRes0 + 1)) {
-        betaResidues = betaResidues.concat([iRes0, iRes1])
+        betaResidues.push(iRes0, iRes1)
       }
 
       // anti-parallel hbonded beta sheet pairs
       if (isCONH(iRes0, iRes1) && isCONH(iRes1, iRes0)) {
-        betaResidues = betaResidues.concat([iRes0, iRes1])
+        betaResidues.push(iRes0, iRes1)
         let normal = vecBetweenResidues(iRes0, iRes1)
         pushToListInDict(residueNormals, iRes0, normal)
         pushToListInDict(residueNormals, iRes1, v3.scaled(normal, -1))
@@ -1234,7 +1260,7 @@ class Soup {
 
       // anti-parallel non-hbonded beta sheet pairs
       if (isCONH(iRes0 - 1, iRes1 + 1) && isCONH(iRes1 - 1, iRes0 + 1)) {
-        betaResidues = betaResidues.concat([iRes0, iRes1])
+        betaResidues.push(iRes0, iRes1)
         let normal = vecBetweenResidues(iRes0, iRes1)
         pushToListInDict(residueNormals, iRes0, v3.scaled(normal, -1))
         pushToListInDict(residueNormals, iRes1, normal)
@@ -1477,19 +1503,24 @@ class Soup {
     }
   }
 
+  /**
+   * Sets the display color of all residues in one pass over the
+   * residueStore: the color index is looked up in the colorTable at
+   * most once rather than once per residue
+   */
   colorResidues () {
-    let residue = this.getResidueProxy()
+    let nRes = this.getResidueCount()
+    let iColor = this.residueStore.iColor
     let isGridActive = _.some(_.values(this.grid.isElem))
     if (isGridActive) {
-      for (let iRes of _.range(this.getResidueCount())) {
-        residue.iRes = iRes
-        residue.color = data.darkGrey
-      }
-    }
-
-    for (let iRes of _.range(this.getResidueCount())) {
-      residue.iRes = iRes
-      residue.color = isGridActive ? data.darkGrey : residue.customColor
+      let iDarkGrey = getValueTableIndex(
+        this.colorTable,
+        new THREE.Color(data.darkGrey),
+        cmpColors
+      )
+      iColor.fill(iDarkGrey, 0, nRes)
+    } else {
+      iColor.set(this.residueStore.iCustomColor.subarray(0, nRes))
     }
   }
 
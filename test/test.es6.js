@@ -1,6 +1,56 @@
 import fs from 'fs'
+import assert from 'assert'
 import { Soup } from '../src/soup'
 import { SoupView, SoupViewController } from '../src/soup-view'
+import { findBondPairs } from '../src/bond-kernel'
+import { SpaceHash } from '../src/pairs'
+
+/**
+ * Deterministic pseudo-random numbers in [0, 1) for fixtures
+ */
+function makeRandom (seed) {
+  let state = seed
+  return () => {
+    state = (state * 1103515245 + 12345) % 2147483648
+    return state / 2147483648
+  }
+}
+
+function getDistSq (xs, ys, zs, i, j) {
+  let dx = xs[i] - xs[j]
+  let dy = ys[i] - ys[j]
+  let dz = zs[i] - zs[j]
+  return dx * dx + dy * dy + dz * dz
+}
+
+function makePdbAtomLine (
+  iAtom,
+  atomType,
+  alt,
+  resType,
+  resNum,
+  x,
+  y,
+  z,
+  elem
+) {
+  return (
+    'ATOM  ' +
+    String(iAtom).padStart(5) +
+    ' ' +
+    atomType.padEnd(4) +
+    alt.padEnd(1) +
+    resType.padStart(3) +
+    ' A' +
+    String(resNum).padStart(4) +
+    '    ' +
+    x.toFixed(3).padStart(8) +
+    y.toFixed(3).padStart(8) +
+    z.toFixed(3).padStart(8) +
+    '  1.00  0.00          ' +
+    elem.padStart(2)
+  )
+}
 
 it('check load soup', function() {
   let f = '../examples/1mbo.pdb'
@@ -23,3 +73,237 @@ it('check load soup views', function() {
   let controller = new SoupViewController(soupView)
   controller.loadViewsFromViewDicts(viewDicts)
 })
+
+it('check findBondPairs against brute force', function () {
+  let random = makeRandom(1)
+  let nAtom = 400
+  let xs = new Float32Array(nAtom)
+  let ys = new Float32Array(nAtom)
+  let zs = new Float32Array(nAtom)
+  let iRes = new Uint32Array(nAtom)
+  let alt = new Uint8Array(nAtom)
+  let cutoffClass = new Uint8Array(nAtom)
+  for (let i = 0; i < nAtom; i += 1) {
+    iRes[i] = Math.floor(i / 10)
+    xs[i] = 8 * (iRes[i] % 5) + 4 * random()
+    ys[i] = 8 * Math.floor(iRes[i] / 5) + 4 * random()
+    zs[i] = 4 * random()
+    alt[i] = random() < 0.2 ? 65 + Math.floor(2 * random()) : 0
+    cutoffClass[i] = Math.floor(3 * random())
+  }
+  // 0 - H, 1 - other CHONPS, 2 - everything else
+  let cutoffSqTable = new Float64Array(9)
+  for (let class1 = 0; class1 < 3; class1 += 1) {
+    for (let class2 = 0; class2 < 3; class2 += 1) {
+      let cutoffSq = 2.4 * 2.4
+      if (class1 === 0 || class2 === 0) {
+        cutoffSq = 1.2 * 1.2
+      } else if (class1 === 1 && class2 === 1) {
+        cutoffSq = 1.9 * 1.9
+      }
+      cutoffSqTable[class1 * 3 + class2] = cutoffSq
+    }
+  }
+
+  let pairs = findBondPairs(
+    xs,
+    ys,
+    zs,
+    iRes,
+    alt,
+    cutoffClass,
+    nAtom,
+    cutoffSqTable,
+    3
+  )
+  let foundKeys = []
+  for (let iPair = 0; iPair < pairs.length; iPair += 2) {
+    assert(pairs[iPair] < pairs[iPair + 1])
+    foundKeys.push(`${pairs[iPair]}-${pairs[iPair + 1]}`)
+  }
+
+  let expectedKeys = []
+  for (let i = 0; i < nAtom; i += 1) {
+    for (let j = i + 1; j < nAtom; j += 1) {
+      if (iRes[i] !== iRes[j]) {
+        continue
+      }
+      if (alt[i] !== 0 && alt[j] !== 0 && alt[i] !== alt[j]) {
+        continue
+      }
+      let cutoffSq = cutoffSqTable[cutoffClass[i] * 3 + cutoffClass[j]]
+      if (getDistSq(xs, ys, zs, i, j) <= cutoffSq) {
+        expectedKeys.push(`${i}-${j}`)
+      }
+    }
+  }
+
+  assert(expectedKeys.length > 0)
+  assert.deepStrictEqual(foundKeys.sort(), expectedKeys.sort())
+})
+
+it('check findBondPairs skips atoms without coordinates', function () {
+  let xs = new Float32Array([NaN, 1, 2])
+  let zeros = new Float32Array(3)
+  let pairs = findBondPairs(
+    xs,
+    zeros,
+    zeros,
+    new Uint32Array(3),
+    new Uint8Array(3),
+    new Uint8Array(3),
+    3,
+    new Float64Array(9).fill(2.25),
+    3
+  )
+  assert.deepStrictEqual(Array.from(pairs), [1, 2])
+})
+
+it('check findBondPairs stays linear with a far outlier atom', function () {
+  // residues of 10 atoms on a lattice, plus one atom at the
+  // 9999.0 placeholder used for missing coordinates
+  let random = makeRandom(3)
+  let nResPerSide = 13
+  let nAtom = 10 * nResPerSide * nResPerSide * nResPerSide + 1
+  let xs = new Float32Array(nAtom)
+  let ys = new Float32Array(nAtom)
+  let zs = new Float32Array(nAtom)
+  let iRes = new Uint32Array(nAtom)
+  let alt = new Uint8Array(nAtom)
+  let cutoffClass = new Uint8Array(nAtom).fill(1)
+  for (let i = 0; i < nAtom - 1; i += 1) {
+    iRes[i] = Math.floor(i / 10)
+    let iX = iRes[i] % nResPerSide
+    let iY = Math.floor(iRes[i] / nResPerSide) % nResPerSide
+    let iZ = Math.floor(iRes[i] / nResPerSide / nResPerSide)
+    xs[i] = 5 * iX + 3 * random()
+    ys[i] = 5 * iY + 3 * random()
+    zs[i] = 5 * iZ + 3 * random()
+  }
+  let iOutlier = nAtom - 1
+  iRes[iOutlier] = iRes[iOutlier - 1] + 1
+  xs[iOutlier] = 9999
+  ys[iOutlier] = 9999
+  zs[iOutlier] = 9999
+  let cutoffSqTable = new Float64Array(9).fill(1.9 * 1.9)
+
+  let getPairs = n =>
+    findBondPairs(xs, ys, zs, iRes, alt, cutoffClass, n, cutoffSqTable, 3)
+
+  let foundKeys = []
+  let pairs = getPairs(nAtom)
+  for (let iPair = 0; iPair < pairs.length; iPair += 2) {
+    foundKeys.push(`${pairs[iPair]}-${pairs[iPair + 1]}`)
+  }
+
+  // atoms of a residue are contiguous, so only scan within residues
+  let expectedKeys = []
+  for (let i = 0; i < nAtom; i += 1) {
+    for (let j = i + 1; j < nAtom && iRes[j] === iRes[i]; j += 1) {
+      if (getDistSq(xs, ys, zs, i, j) <= cutoffSqTable[0]) {
+        expectedKeys.push(`${i}-${j}`)
+      }
+    }
+  }
+  assert(expectedKeys.length > 0)
+  assert.deepStrictEqual(foundKeys.sort(), expectedKeys.sort())
+
+  // a grid sized from the bounding box would put every atom in
+  // one cell and make the search quadratic
+  let getTime = n => {
+    let start = Date.now()
+    for (let iRepeat = 0; iRepeat < 5; iRepeat += 1) {
+      getPairs(n)
+    }
+    return Date.now() - start
+  }
+  let timeWithout = getTime(nAtom - 1)
+  let timeWith = getTime(nAtom)
+  assert(timeWith < 4 * timeWithout + 100)
+})
+
+it('check bonds are stored once in each direction', function () {
+  let lines = [
+    makePdbAtomLine(1, 'N', '', 'ALA', 1, 0.0, 0.0, 0.0, 'N'),
+    makePdbAtomLine(2, 'CA', '', 'ALA', 1, 1.458, 0.0, 0.0, 'C'),
+    makePdbAtomLine(3, 'C', '', 'ALA', 1, 2.009, 1.42, 0.0, 'C'),
+    makePdbAtomLine(4, 'O', '', 'ALA', 1, 1.246, 2.39, 0.0, 'O'),
+    makePdbAtomLine(5, 'CB', '', 'ALA', 1, 1.988, -0.773, -1.199, 'C'),
+    makePdbAtomLine(6, 'H', '', 'ALA', 1, -0.5, -0.8, 0.3, 'H'),
+    makePdbAtomLine(7, 'N', '', 'SER', 2, 3.332, 1.536, 0.0, 'N'),
+    makePdbAtomLine(8, 'CA', '', 'SER', 2, 3.988, 2.839, 0.0, 'C'),
+    makePdbAtomLine(9, 'C', '', 'SER', 2, 5.504, 2.693, 0.0, 'C'),
+    makePdbAtomLine(10, 'O', '', 'SER', 2, 6.03, 1.58, 0.0, 'O'),
+    makePdbAtomLine(11, 'CB', '', 'SER', 2, 3.54, 3.643, 1.219, 'C'),
+    makePdbAtomLine(12, 'OG', 'A', 'SER', 2, 2.139, 3.824, 1.216, 'O'),
+    makePdbAtomLine(13, 'OG', 'B', 'SER', 2, 2.6, 4.9, 1.8, 'O'),
+    'END'
+  ]
+  let soup = new Soup()
+  soup.parsePdbData(lines.join('\n'), 'test')
+  soup.calcBondsStrategic()
+
+  let nBond = soup.getBondCount()
+  assert(nBond > 0)
+  let counts = {}
+  for (let iBond = 0; iBond < nBond; iBond += 1) {
+    let iAtom1 = soup.bondStore.iAtom1[iBond]
+    let iAtom2 = soup.bondStore.iAtom2[iBond]
+    assert.notStrictEqual(iAtom1, iAtom2)
+    let key = `${iAtom1}-${iAtom2}`
+    counts[key] = (counts[key] || 0) + 1
+  }
+  for (let key of Object.keys(counts)) {
+    let [iAtom1, iAtom2] = key.split('-')
+    assert.strictEqual(counts[key], 1)
+    assert.strictEqual(counts[`${iAtom2}-${iAtom1}`], 1)
+  }
+  // the two conformations of OG are never bonded
+  assert(!('11-12' in counts))
+})
+
+it('check SpaceHash returns each close pair once', function () {
+  let random = makeRandom(2)
+  let nVertex = 500
+  let div = 5.0
+  let xs = new Float32Array(nVertex)
+  let ys = new Float32Array(nVertex)
+  let zs = new Float32Array(nVertex)
+  for (let i = 0; i < nVertex; i += 1) {
+    xs[i] = 40 * random() - 20
+    ys[i] = 40 * random() - 20
+    zs[i] = 40 * random() - 20
+  }
+  let spaceHash = new SpaceHash(xs, ys, zs, div)
+
+  let closeKeys = new Set()
+  for (let [i, j] of spaceHash.getClosePairs()) {
+    assert(i < j)
+    let key = `${i}-${j}`
+    assert(!closeKeys.has(key))
+    closeKeys.add(key)
+  }
+
+  let cutoff = 3.5
+  let foundKeys = []
+  for (let [i, j] of spaceHash.getPairsWithinDistance(cutoff)) {
+    assert(i < j)
+    foundKeys.push(`${i}-${j}`)
+  }
+
+  let expectedKeys = []
+  for (let i = 0; i < nVertex; i += 1) {
+    for (let j = i + 1; j < nVertex; j += 1) {
+      let distSq = getDistSq(xs, ys, zs, i, j)
+      if (distSq < div * div) {
+        assert(closeKeys.has(`${i}-${j}`))
+      }
+      if (distSq <= cutoff * cutoff) {
+        expectedKeys.push(`${i}-${j}`)
+      }
+    }
+  }
+
+  assert(expectedKeys.length > 0)
+  assert.deepStrictEqual(foundKeys.sort(), expectedKeys.sort())
+})
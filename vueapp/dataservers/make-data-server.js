@@ -14,7 +14,7 @@ const nopt = require('nopt')
 const mustache = require('mustache')
 const _ = require('lodash')
 
-const dataServerMustache = `
+const dataServerHeaderMustache = `
 
 define(function() {
 
@@ -42,10 +42,9 @@ function getViewDicts() {
 var views = {{{viewsJsonStr}}};
 
 var pdbLines = [
-  {{#pdbLines}} 
-    "{{{.}}}", 
-  {{/pdbLines}}
-];
+`
+
+const dataServerFooter = `];
 
 return result;
     
@@ -53,6 +52,22 @@ return result;
 
 `
 
+/**
+ * Streams the escaped pdbLines into the open file fd in blocks,
+ * so the full data-server text is never built in memory
+ */
+function writePdbLines (fd, pdbLines) {
+  const blockSize = 1000
+  for (let start = 0; start < pdbLines.length; start += blockSize) {
+    let end = Math.min(start + blockSize, pdbLines.length)
+    let block = ''
+    for (let i = start; i < end; i += 1) {
+      block += `    "${pdbLines[i].replace(/"/g, '\\"')}",\n`
+    }
+    fs.writeSync(fd, block)
+  }
+}
+
 let knownOpts = {
   'out': [String, null],
   'batch': [Boolean, false],
@@ -82,7 +97,6 @@ if (remain.length < 1) {
     const pdbText = fs.readFileSync(pdb, 'utf8')
 
     let pdbLines = pdbText.split(/\r?\n/)
-    pdbLines = _.map(pdbLines, (l) => l.replace(/"/g, '\\"'))
 
     let viewsJson = pdb.replace('.pdb', '') + '.views.json'
     let views = {}
@@ -91,13 +105,16 @@ if (remain.length < 1) {
       let text = fs.readFileSync(viewsJson, 'utf8')
       views = JSON.parse(text)
     }
-    let viewsJsonStr = JSON.stringify(views, null, 2)
+    let viewsJsonStr = JSON.stringify(views)
 
     let pdbId = base
-    let dataJsText = mustache.render(
-      dataServerMustache,
-      {pdbId, pdbLines, viewsJsonStr})
-    fs.writeFileSync(dataJs, dataJsText)
+    let fd = fs.openSync(dataJs, 'w')
+    fs.writeSync(
+      fd,
+      mustache.render(dataServerHeaderMustache, {pdbId, viewsJsonStr}))
+    writePdbLines(fd, pdbLines)
+    fs.writeSync(fd, dataServerFooter)
+    fs.closeSync(fd)
     console.log(`Made ${dataJs}`)
   }
 }
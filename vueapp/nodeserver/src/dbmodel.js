@@ -47,11 +47,12 @@ function unwrapInstance (instance) {
 }
 
 async function deleteFileList (fileList) {
-  for (let f of fileList) {
-    if (fs.existsSync(f.path)) {
-      console.log('>> router.deleteFileList', f.path)
-      await del(f.path)
-    }
+  let paths = fileList
+    .map(f => f.path)
+    .filter(p => fs.existsSync(p))
+  if (paths.length > 0) {
+    console.log('>> router.deleteFileList', paths)
+    await del(paths)
   }
 }
 
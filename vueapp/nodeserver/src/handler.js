@@ -163,6 +163,21 @@ function parsetTitleFromPdbText (text) {
   return result
 }
 
+// Titles of PDB files keyed by filename, so that listing a directory
+// only re-reads the PDB files that have been modified since
+let pdbTitles = {}
+
+function getPdbTitle (pdb) {
+  let mtime = fs.statSync(pdb).mtimeMs
+  let entry = pdbTitles[pdb]
+  if (!entry || entry.mtime !== mtime) {
+    const pdbText = fs.readFileSync(pdb, 'utf8')
+    entry = { mtime, title: parsetTitleFromPdbText(pdbText) }
+    pdbTitles[pdb] = entry
+  }
+  return entry.title
+}
+
 function isDirectory (f) {
   try {
     return fs.statSync(f).isDirectory()
@@ -194,9 +209,8 @@ async function publicGetFiles (dirname) {
       payload.directories.push(filename)
     } else if (_.endsWith(filename, '.pdb')) {
       try {
-        const pdbText = fs.readFileSync(path.join(dirname, filename), 'utf8')
         payload.files.push({
-          title: parsetTitleFromPdbText(pdbText),
+          title: getPdbTitle(path.join(dirname, filename)),
           filename: path.join(dirname, filename),
           name: filename
         })